@@ -1,69 +1,125 @@
+import contextlib
 import logging
 import sys
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from functools import lru_cache
 from pathlib import Path
-from typing import Sequence
-
-from rich.console import Console
-from rich.text import Text
+from typing import TYPE_CHECKING, Callable, Optional, Sequence
 
 from ._app import OSXAPP
+from ._cache import MACHO_CACHE_NAME, FileCache, default_cache_dir
 from ._commands import Command
 from ._issues import Issue
 from ._macho import sign_impl
 from ._notarize import notarize_impl
 from ._util import run_commands, serialize_to_sh
 
+if TYPE_CHECKING:
+    from rich.console import Console
+    from rich.style import Style
+    from rich.text import Text
+
+
+_VERBOSITY = {0: logging.ERROR, 1: logging.WARNING, 2: logging.INFO, 3: logging.DEBUG}
+
+
+# rich is imported lazily, only once there is something to render
+@lru_cache(maxsize=1)
+def _get_console() -> "Console":
+    from rich.console import Console
+
+    return Console()
+
+
+@lru_cache(maxsize=1)
+def _get_styles() -> dict[str, "Style"]:
+    from rich.style import Style
+
+    return {
+        "title": Style(bold=True, color="magenta"),
+        "good": Style(bold=True, color="green"),
+        "bad": Style(bold=True, color="red"),
+        "details": Style(color="red"),
+    }
+
+
+@lru_cache(maxsize=1)
+def _get_templates() -> dict[str, "Text"]:
+    """Static parts of the summary output, rendered once"""
+    from rich.text import Text
+
+    styles = _get_styles()
+    return {
+        "summary": Text("Summary for ", style=styles["title"]),
+        "no_issues": Text("Found no issues!", style=styles["good"]),
+        "found": Text("Found "),
+        "of_which": Text("issues of which "),
+        "can_fix": Text("can be fixed."),
+        "not_fixed": Text.assemble("Could ", ("not ", styles["bad"]), "fix issue: "),
+    }
+
 
 def configure_logging(verbose: int):
-    verbosity = {0: logging.ERROR, 1: logging.WARNING, 2: logging.INFO, 3: logging.DEBUG}
-    logging.basicConfig(format="%(levelname)s:%(message)s", level=verbosity[verbose])
+    logging.basicConfig(format="%(levelname)s:%(message)s", level=_VERBOSITY[verbose])
 
 
-def print_summary(app: OSXAPP, issues: Sequence[Issue]):
-    console = Console()
-    text = Text()
-    text.append(f"Summary for {app.root}\n", style="bold magenta")
+def print_summary(app: OSXAPP, issues: Sequence[Issue], n_fixable: Optional[int] = None):
+    from rich.text import Text
+
+    styles = _get_styles()
+    templates = _get_templates()
+    parts: list["Text | tuple[str, Style]"] = [templates["summary"], (f"{app.root}\n", styles["title"])]
     if not issues:
-        text.append("Found no issues!", style="bold lime")
+        parts.append(templates["no_issues"])
     else:
-        text.append(
-            text.assemble(
-                ("Found ", ""),
-                (f"{len(issues)} ", "bold red"),
-                ("issues of which ", ""),
-                (f"{len([issue for issue in issues if issue.fixable])} ", "bold green"),
-                ("can be fixed.", ""),
-            )
+        if n_fixable is None:
+            n_fixable = sum(1 for issue in issues if issue.fixable)
+        parts.extend(
+            [
+                templates["found"],
+                (f"{len(issues)} ", styles["bad"]),
+                templates["of_which"],
+                (f"{n_fixable} ", styles["good"]),
+                templates["can_fix"],
+            ]
         )
 
-    console.print(text)
+    _get_console().print(Text.assemble(*parts))
 
 
 def print_unfixable(app: OSXAPP, issues: Sequence[Issue]):
-    console = Console()
-    text = Text()
+    from rich.text import Text
+
+    styles = _get_styles()
+    not_fixed = _get_templates()["not_fixed"]
+    parts: list["Text | tuple[str, Style]"] = []
     for issue in issues:
-        text.append(
-            text.assemble(
-                ("Could ", ""),
-                (f"not ", "bold red"),
-                ("fix issue: ", ""),
-                (f"{issue.details}\n ", "red"),
-            )
-        )
+        parts.append(not_fixed)
+        parts.append((f"{issue.details}\n ", styles["details"]))
 
-    console.print(text)
+    _get_console().print(Text.assemble(*parts))
 
 
-def parse_args() -> Namespace:
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
+
+@lru_cache(maxsize=1)
+def _build_parser() -> ArgumentParser:
     common_args = ArgumentParser(add_help=False)
     common_args.add_argument("-v", "--verbose", action="count", default=0)
     common_args.add_argument("--no-progress", action="store_true")
     common_args.add_argument("--dry-run", action="store_true")
     common_args.add_argument("app_bundle", type=Path)
     common_args.add_argument("--sh-output", type=Path)
+    common_args.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"Cache parsed binaries in {default_cache_dir()} to speed up repeated runs on the same bundle.",
+    )
 
     fix_args = ArgumentParser(add_help=False)
     fix_args.add_argument("--rc-path-delete", action="store_true")
@@ -72,6 +128,13 @@ def parse_args() -> Namespace:
     sign_args = ArgumentParser(add_help=False)
     sign_args.add_argument("entitlement_file", type=Path)
     sign_args.add_argument("developer_id", type=str)
+    sign_args.add_argument(
+        "-j",
+        "--jobs",
+        type=_positive_int,
+        default=None,
+        help="Maximum number of binaries signed concurrently (default: number of CPUs).",
+    )
 
     notarize_args = ArgumentParser(add_help=False)
     notarize_args.add_argument("-v", "--verbose", action="count", default=0)
@@ -110,7 +173,11 @@ def parse_args() -> Namespace:
         ),
     )
 
-    return parser.parse_args()
+    return parser
+
+
+def parse_args() -> Namespace:
+    return _build_parser().parse_args()
 
 
 def check(app: OSXAPP):
@@ -135,21 +202,21 @@ def fix(app: OSXAPP, rc_path_delete: bool = False, force_update: bool = False, n
         rc_path_delete: delete rc_paths that point outside the app. Use with care
 
     """
-    issues = app.check_macho_binaries(rc_path_delete=rc_path_delete)
-    issues.extend(app.check_jar_binaries(force_update=force_update))
-    print_summary(app, issues)
-
-    unfixable = [issue for issue in issues if not issue.fixable]
-    print_unfixable(app, unfixable)
-
+    issues = app.check_binaries(rc_path_delete=rc_path_delete, force_update=force_update)
     commands: list[Command] = []
+    unfixable: list[Issue] = []
     for issue in issues:
         if issue.fixable:
             assert issue.fix is not None
             commands.append(issue.fix)
+        else:
+            unfixable.append(issue)
+
+    print_summary(app, issues, n_fixable=len(commands))
+    print_unfixable(app, unfixable)
 
     if need_repack:
-        commands.extend(app.jar_repack)
+        commands.extend(app.jar_repack(commands))
     return commands
 
 
@@ -161,10 +228,11 @@ def sign(app: OSXAPP, entitlement_file: Path, developer_id: str) -> list[Command
         commands.extend(jar.sign(entitlement_file, developer_id))
 
     # need to repack before signing the rest of the app
-    commands.extend(app.jar_repack)
+    commands.extend(app.jar_repack(commands))
 
+    # individual binaries can be signed concurrently, the bundle itself has to come last
     for binary in app.macho_binaries:
-        commands.append(sign_impl(entitlement_file, developer_id, binary.path))
+        commands.append(sign_impl(entitlement_file, developer_id, binary.path, parallel=True))
 
     commands.append(sign_impl(entitlement_file, developer_id, app.bundle_exe))
     commands.append(sign_impl(entitlement_file, developer_id, app.root))
@@ -186,38 +254,45 @@ def notarize(app_path: Path, keychain_profile: str, keychain: Path, apple_id_ema
     return success
 
 
+_APP_ACTIONS: dict[str, Callable[[OSXAPP, Namespace], list[Command]]] = {
+    "check": lambda app, args: check(app),
+    "fix": lambda app, args: fix(app, args.rc_path_delete, args.force_update),
+    "sign": lambda app, args: sign(app, args.entitlement_file, args.developer_id),
+    "fixsign": lambda app, args: fixsign(
+        app, args.entitlement_file, args.developer_id, args.rc_path_delete, args.force_update
+    ),
+}
+
+
 def main():
     args = parse_args()
     configure_logging(verbose=args.verbose)
 
-    commands: list[Command] = []
-    match args.action:
-        case "notarize":
-            return notarize(args.app_bundle, args.keychain_profile, args.keychain, args.apple_id_email, args.team_id)
-        case "check" | "fix" | "sign" | "fixsign":
-            app = OSXAPP.from_path(args.app_bundle, with_progress=not args.no_progress)
-            commands.extend(app.jar_extract)
-            match args.action:
-                case "check":
-                    # force dry_run to be true for now
-                    args.dry_run = True
-                    commands.extend(check(app))
-                case "fix":
-                    commands.extend(fix(app, args.rc_path_delete, args.force_update))
-                case "sign":
-                    commands.extend(sign(app, args.entitlement_file, args.developer_id))
-                case "fixsign":
-                    commands.extend(
-                        fixsign(app, args.entitlement_file, args.developer_id, args.rc_path_delete, args.force_update)
-                    )
-        case _:
-            raise ValueError(f"Unexpected action {args.action}")
+    if args.action == "notarize":
+        return notarize(args.app_bundle, args.keychain_profile, args.keychain, args.apple_id_email, args.team_id)
+
+    action = _APP_ACTIONS.get(args.action)
+    if action is None:
+        raise ValueError(f"Unexpected action {args.action}")
+
+    if args.action == "check":
+        # force dry_run to be true for now
+        args.dry_run = True
+
+    cache = FileCache(default_cache_dir() / MACHO_CACHE_NAME) if args.cache else contextlib.nullcontext()
+    with cache as macho_cache:
+        app = OSXAPP.from_path(args.app_bundle, with_progress=not args.no_progress, macho_cache=macho_cache)
+    action_commands = action(app, args)
+    # jars are only extracted if their binaries are changed
+    commands: list[Command] = app.jar_extract(action_commands)
+    commands.extend(action_commands)
 
     if args.sh_output:
         serialize_to_sh(commands, args.sh_output)
 
     if not args.dry_run:
-        run_commands(commands)
+        # only the signing subcommands have --jobs
+        run_commands(commands, batch=True, max_parallel=getattr(args, "jobs", None))
 
 
 if __name__ == "__main__":
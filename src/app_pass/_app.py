@@ -1,15 +1,17 @@
 import contextlib
 import logging
+import os
+import plistlib
+import re
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from functools import cached_property
 from pathlib import Path
-from typing import List, Optional
-
-from lxml import etree
-from rich.progress import Progress
+from typing import List, Optional, Union
 
 from app_pass._commands import Command
 
+from ._cache import FileCache
 from ._issues import BuildIssue, Issue, LibraryPathIssue, RcpathIssue
 from ._jar import Jar
 from ._macho import Build, MachOBinary, fix_lib_id, fix_load_path, fix_rpath, parse_macho, remove_rpath, vtool_overwrite
@@ -18,16 +20,22 @@ from ._util import BinaryType, iter_all_binaries
 logger = logging.getLogger(__name__)
 
 
-def parse_plist(plist: Path):
-    """partial read of plist"""
-    doc = etree.parse(plist)
-    root = doc.getroot()
-    return {x.text: x.getnext().text for x in root.findall(".//dict/key")}
+def parse_plist(plist: Path) -> dict:
+    """read plist (xml or binary)"""
+    with open(plist, "rb") as f:
+        return plistlib.load(f)
 
 
 # for now the assumption is that whenever these are encountered, things should be fine.
-_ALLOWED_SPECIAL = [Path(x) for x in ["@rpath", "@executable_path", "@loader_path"]]
-_ALLOWED_SYSTEM = [Path(x) for x in ["/System/", "/usr/", "/Library/"]]
+_ALLOWED_SPECIAL = ["@rpath", "@executable_path", "@loader_path"]
+_ALLOWED_SYSTEM = ["/System", "/usr", "/Library"]
+# matches any of the allowed paths or anything below them
+_ALLOWED_REGEX = re.compile(f"^(?:{'|'.join(re.escape(x) for x in _ALLOWED_SYSTEM + _ALLOWED_SPECIAL)})(?:/|$)")
+
+
+def is_allowed_path(path: Union[str, Path]) -> bool:
+    """Same as `any(path.is_relative_to(x) for x in allowed)` but a single regex match"""
+    return _ALLOWED_REGEX.match(str(path)) is not None
 
 
 @dataclass
@@ -41,7 +49,7 @@ class OSXAPP:
     default_build: Build = Build(platform="macos", minos="10.10", sdk="10.10")
 
     @staticmethod
-    def from_path(root: Path, with_progress=True) -> "OSXAPP":
+    def from_path(root: Path, with_progress=True, macho_cache: Optional[FileCache] = None) -> "OSXAPP":
         if not root.is_absolute():
             root = root.resolve()
         plist = root / "Contents" / "Info.plist"
@@ -57,21 +65,42 @@ class OSXAPP:
 
         loader_path = bundle_exe.parent
 
-        macho_binaries: list[MachOBinary] = []
-        jars: list[Jar] = []
+        macho_futures: list[Future[MachOBinary]] = []
+        jar_futures: list[Future[Jar]] = []
 
         if with_progress:
+            from rich.progress import Progress
+
             prog = Progress
         else:
             prog = contextlib.nullcontext
 
-        with prog() as progress:
+        # parsing is dominated by waiting on otool/vtool subprocesses, so threads are sufficient
+        with prog() as progress, ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
             for f, bin_type in iter_all_binaries(root, progress):
                 if bin_type == BinaryType.MACHO:
-                    macho_bin = parse_macho(f)
-                    macho_binaries.append(macho_bin)
+                    if macho_cache is not None:
+                        macho_futures.append(executor.submit(macho_cache.get_or_compute, f, parse_macho))
+                    else:
+                        macho_futures.append(executor.submit(parse_macho, f))
                 elif bin_type == BinaryType.JAR:
-                    jars.append(Jar.from_path(f, progress))
+                    jar_futures.append(executor.submit(Jar.from_path, f, progress))
+
+            futures: list[Future] = [*macho_futures, *jar_futures]
+            task = None
+            if progress is not None:
+                task = progress.add_task("Parsing binaries", total=len(futures))
+            for future in as_completed(futures):
+                if progress is not None:
+                    assert task is not None
+                    progress.advance(task, 1)
+
+            if progress is not None:
+                assert task is not None
+                progress.remove_task(task)
+
+        macho_binaries = [future.result() for future in macho_futures]
+        jars = [future.result() for future in jar_futures]
 
         return OSXAPP(root, loader_path, bundle_exe, macho_binaries, jars)
 
@@ -80,57 +109,107 @@ class OSXAPP:
         assert self.bundle_exe.is_file()
         assert self.bundle_exe.is_relative_to(self.root), self.bundle_exe
 
-    @property
-    def jar_extract(self) -> list[Command]:
-        commands = []
-        for jar in self.jars:
-            if jar.binaries:
-                commands.extend(jar.create_commands)
-        return commands
+    def modified_jars(self, commands: list[Command]) -> list[Jar]:
+        """Jars with at least one binary that is modified (fixed or signed) by commands"""
+        args = {arg for command in commands for arg in command.args}
+        return [jar for jar in self.jars if any(str(binary.path) in args for binary in jar.binaries)]
 
-    @property
-    def jar_repack(self) -> list[Command]:
-        commands = []
-        for jar in self.jars:
-            if jar.binaries:
-                commands.extend(jar.repack())
-        return commands
+    def jar_extract(self, commands: list[Command]) -> list[Command]:
+        extract_commands = []
+        for jar in self.modified_jars(commands):
+            extract_commands.extend(jar.create_commands)
+        return extract_commands
+
+    def jar_repack(self, commands: list[Command]) -> list[Command]:
+        repack_commands = []
+        for jar in self.modified_jars(commands):
+            repack_commands.extend(jar.repack())
+        return repack_commands
 
     @cached_property
     def libraries(self) -> dict[str, MachOBinary]:
         return {x.path.name: x for x in self.macho_binaries}
 
+    @cached_property
+    def loader_candidates(self) -> list[Path]:
+        """Absolute loader path and all its parents up to the app root"""
+        loader_root_relative = self.loader_path.relative_to(self.root)
+        return [self.root / candidate for candidate in [loader_root_relative, *loader_root_relative.parents]]
+
+    @cached_property
+    def _loader_relative_cache(self) -> dict[str, Path]:
+        return {}
+
     def lib_loader_relative(self, libname):
+        if libname in self._loader_relative_cache:
+            return self._loader_relative_cache[libname]
+
         assert libname in self.libraries
         lib_path = self.libraries[libname].path
 
-        loader_root_relative = self.loader_path.relative_to(self.root)
-
-        candiates = [loader_root_relative] + list(loader_root_relative.parents)
-
         loader_relative_path = None
-        for i, candidate in enumerate(candiates):
-            if lib_path.is_relative_to(self.root / candidate):
+        for i, candidate in enumerate(self.loader_candidates):
+            if lib_path.is_relative_to(candidate):
                 up = "/".join([".."] * i)
-                loader_relative_path = Path("@loader_path") / up / lib_path.relative_to(self.root / candidate)
+                loader_relative_path = Path("@loader_path") / up / lib_path.relative_to(candidate)
                 break
 
         if loader_relative_path:
+            self._loader_relative_cache[libname] = loader_relative_path
             return loader_relative_path
         else:
             raise ValueError(f"Could not determine loader relative path for {lib_path} in {self.root=}")
 
     @cached_property
-    def bundle_exe_rpaths(self) -> List[Path]:
-        filtered = list(filter(lambda x: x.path == self.bundle_exe, self.macho_binaries))
-        assert len(filtered) == 1
-        bundle_exe_macho = filtered[0]
-        if any(rc.is_absolute() for rc in bundle_exe_macho.rpaths):
+    def _by_path(self) -> dict[Path, MachOBinary]:
+        return {x.path: x for x in self.macho_binaries}
+
+    @cached_property
+    def bundle_exe_rpaths(self) -> tuple[str, ...]:
+        assert self.bundle_exe in self._by_path
+        bundle_exe_macho = self._by_path[self.bundle_exe]
+        if any(rc.startswith("/") for rc in bundle_exe_macho.rpaths):
             raise ValueError(
                 f"{bundle_exe_macho.rpaths=} in {bundle_exe_macho.path=} need fixing, may not be absolute."
             )
         return bundle_exe_macho.rpaths
 
+    @cached_property
+    def bundle_exe_rpath_dirs(self) -> list[tuple[Path, Optional[Path]]]:
+        """rpaths of the bundle executable together with the directory they point to
+
+        The directory is None if the rpath is not relative to @loader_path/@executable_path.
+        """
+        rpath_dirs: list[tuple[Path, Optional[Path]]] = []
+        for rpath_str in self.bundle_exe_rpaths:
+            rpath = Path(rpath_str)
+            assert not rpath.is_absolute()
+            # normalized by Path, e.g. a trailing slash is dropped
+            rpath_s = str(rpath)
+            rc_abs = None
+            if "@loader_path/" in rpath_s:
+                rc_abs = self.loader_path / rpath_s.replace("@loader_path/", "")
+            elif "@executable_path/" in rpath_s:
+                rc_abs = self.loader_path / rpath_s.replace("@executable_path/", "")
+            rpath_dirs.append((rpath, rc_abs))
+        return rpath_dirs
+
+    @cached_property
+    def _issues_cache(self) -> dict[tuple[bool, bool], List[Issue]]:
+        return {}
+
+    def check_binaries(self, rc_path_delete: bool = False, force_update: bool = False) -> List[Issue]:
+        """Issues of all mach-o binaries, including those within jars
+
+        Results are computed once per combination of flags and reused on subsequent calls.
+        """
+        key = (rc_path_delete, force_update)
+        if key not in self._issues_cache:
+            issues = self.check_macho_binaries(rc_path_delete=rc_path_delete)
+            issues.extend(self.check_jar_binaries(force_update=force_update))
+            self._issues_cache[key] = issues
+        return list(self._issues_cache[key])
+
     def check_macho_binaries(self, rc_path_delete: bool = False) -> List[Issue]:
         issues = []
         for macho_binary in self.macho_binaries:
@@ -162,9 +241,11 @@ class OSXAPP:
                     )
                 issues.append(issue)
                 if issue.fixable:
-                    logger.info(f"Issue found: {macho_binary.path}, {type(issue)}, {issue.fixable=}")
+                    logger.info("Issue found: %s, %s, issue.fixable=%s", macho_binary.path, type(issue), issue.fixable)
                 else:
-                    logger.warning(f"Issue found: {macho_binary.path}, {type(issue)}, {issue.fixable=}")
+                    logger.warning(
+                        "Issue found: %s, %s, issue.fixable=%s", macho_binary.path, type(issue), issue.fixable
+                    )
 
         return issues
 
@@ -201,9 +282,9 @@ class OSXAPP:
                         )
                     issues.append(issue)
                     if issue.fixable:
-                        logger.info(f"Issue found: {binary.path}, {type(issue)}, {issue.fixable=}")
+                        logger.info("Issue found: %s, %s, issue.fixable=%s", binary.path, type(issue), issue.fixable)
                     else:
-                        logger.warning(f"Issue found: {binary.path}, {type(issue)}, {issue.fixable=}")
+                        logger.warning("Issue found: %s, %s, issue.fixable=%s", binary.path, type(issue), issue.fixable)
 
         return issues
 
@@ -212,7 +293,7 @@ def fix_path_pointer(app: OSXAPP, path: Path) -> Optional[Path]:
     """
     Return a modified, valid path inside the app for a given path
     """
-    if any(path.is_relative_to(x) for x in _ALLOWED_SYSTEM + _ALLOWED_SPECIAL):
+    if is_allowed_path(path):
         # could still be broken but if the app is running at all, this should
         # be fine
         return path
@@ -220,16 +301,8 @@ def fix_path_pointer(app: OSXAPP, path: Path) -> Optional[Path]:
     if path.is_absolute() and path.is_relative_to(app.root):
         # we should be able to fix it somehow.
         # check if relative to one of the rpaths of the main executable
-        app_rpaths = app.bundle_exe_rpaths
-        for rpath in app_rpaths:
-            assert not rpath.is_absolute()
-            if "@loader_path/" in str(rpath):
-                rc_abs = app.loader_path / Path(str(rpath).replace("@loader_path/", ""))
-            elif "@executable_path/" in str(rpath):
-                rc_abs = app.loader_path / Path(str(rpath).replace("@executable_path/", ""))
-            elif "@executable_path/" in str(rpath):
-                raise ValueError("Didn't really expect a relative path with @rpath, but it seems to exist :).")
-            else:
+        for rpath, rc_abs in app.bundle_exe_rpath_dirs:
+            if rc_abs is None:
                 raise ValueError(f"Could not resolve rc_path - probably not valid {path}")
 
             if path.is_relative_to(rc_abs):
@@ -246,7 +319,7 @@ def check_id_needs_fix(app: OSXAPP, binary: MachOBinary) -> List[LibraryPathIssu
     if not binary.id_:
         return []
 
-    if not any(binary.id_.is_relative_to(x) for x in _ALLOWED_SYSTEM + _ALLOWED_SPECIAL):
+    if not is_allowed_path(binary.id_):
         return [
             LibraryPathIssue(
                 fixable=True,
@@ -261,8 +334,8 @@ def check_id_needs_fix(app: OSXAPP, binary: MachOBinary) -> List[LibraryPathIssu
 def check_libs_need_fix(app: OSXAPP, binary: MachOBinary) -> List[LibraryPathIssue]:
     invalid = []
     for lib in binary.dylibs:
-        if not any(lib.is_relative_to(x) for x in _ALLOWED_SYSTEM + _ALLOWED_SPECIAL):
-            invalid.append(lib)
+        if not is_allowed_path(lib):
+            invalid.append(Path(lib))
 
     issues = []
     # try to find a direct hit for the library
@@ -284,7 +357,10 @@ def check_libs_need_fix(app: OSXAPP, binary: MachOBinary) -> List[LibraryPathIss
 
 def check_rpaths_need_fix(app: OSXAPP, binary: MachOBinary, rc_path_delete: bool) -> List[RcpathIssue]:
     issues: List[RcpathIssue] = []
-    for pth in binary.rpaths:
+    for rpath in binary.rpaths:
+        if is_allowed_path(rpath):
+            continue
+        pth = Path(rpath)
         fixed = fix_path_pointer(app, pth)
         if fixed and fixed != pth:
             issues.append(
@@ -0,0 +1,88 @@
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# bump whenever the layout of cached objects (e.g. MachOBinary) changes
+MACHO_CACHE_NAME = "macho-v1.sqlite"
+
+
+def default_cache_dir() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    base = Path(cache_home) if cache_home else Path.home() / ".cache"
+    return base / "app-pass"
+
+
+class FileCache:
+    """Persistent cache for results computed from a single file
+
+    One sqlite row per path, valid as long as mtime and size match, so it is
+    invalidated as soon as the file is modified (e.g. by install_name_tool).
+    Failing to read or write the cache is logged and otherwise ignored.
+    Safe to use from multiple threads.
+    """
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> "FileCache":
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.cache_file, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, value BLOB NOT NULL)"
+        )
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        assert self._db is not None
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def _read(self, path: Path, st: os.stat_result) -> Optional[Any]:
+        assert self._db is not None
+        with self._lock:
+            row = self._db.execute("SELECT mtime_ns, size, value FROM entries WHERE path = ?", (str(path),)).fetchone()
+        if row is None or row[:2] != (st.st_mtime_ns, st.st_size):
+            return None
+        return pickle.loads(row[2])
+
+    def _write(self, path: Path, st: os.stat_result, value: Any):
+        assert self._db is not None
+        data = pickle.dumps(value)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (path, mtime_ns, size, value) VALUES (?, ?, ?, ?)",
+                (str(path), st.st_mtime_ns, st.st_size, data),
+            )
+
+    def get_or_compute(self, path: Path, compute: Callable[[Path], T]) -> T:
+        assert self._db is not None, "FileCache needs to be used as a context manager"
+        st = path.stat()
+        try:
+            cached = self._read(path, st)
+        except Exception as e:
+            # e.g. entries written by an incompatible version
+            logger.debug("Ignoring unreadable cache entry for %s: %s", path, e)
+            cached = None
+        if cached is not None:
+            return cached
+
+        result = compute(path)
+
+        try:
+            self._write(path, st, result)
+        except Exception as e:
+            logger.warning("Could not cache result for %s: %s", path, e)
+        return result
@@ -1,9 +1,9 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Command:
     # One or multiple commands that can be executed in the shell
     args: list[str]
@@ -21,16 +21,25 @@ class Command:
     server.
     Mark those commands that something useful can be done ;/
     """
+    parallel: bool = False
+    """
+    Commands that do not depend on each other (e.g. signing individual binaries)
+    can be run concurrently with neighboring commands that are marked as well.
+    """
 
-    def to_sh(self) -> list[str]:
-        args = [f'"{arg}"' for arg in self.args]
-        cmds = [" ".join(args)]
-        if self.cwd:
-            cmds.insert(0, f'"cd" "{self.cwd}"')
-            cmds.append('"cd" "-"')
-
+    def to_sh_iter(self) -> Iterator[str]:
         if self.comment:
             # fix multi-line comments - who knows
-            cmds = [f"# {c}" for c in self.comment.split("\n")] + cmds
+            for c in self.comment.split("\n"):
+                yield f"# {c}"
 
-        return cmds
+        if self.cwd:
+            yield f'"cd" "{self.cwd}"'
+
+        yield " ".join(f'"{arg}"' for arg in self.args)
+
+        if self.cwd:
+            yield '"cd" "-"'
+
+    def to_sh(self) -> list[str]:
+        return list(self.to_sh_iter())
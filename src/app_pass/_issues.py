@@ -4,23 +4,23 @@ from typing import Optional
 from ._commands import Command
 
 
-@dataclass
+@dataclass(slots=True)
 class Issue:
     fixable: bool
     details: str
     fix: Optional[Command] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class BuildIssue(Issue):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class RcpathIssue(Issue):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class LibraryPathIssue(Issue):
     pass
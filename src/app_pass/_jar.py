@@ -2,20 +2,31 @@ import atexit
 import logging
 import shutil
 import tempfile
+import zipfile
 from dataclasses import dataclass
-from functools import partial
 from pathlib import Path
-from typing import Optional
-
-from rich.progress import Progress
+from typing import TYPE_CHECKING, Optional
 
 from app_pass._commands import Command
 from app_pass._macho import MachOBinary, parse_macho, sign_impl
 
-from ._util import BinaryObj, BinaryType, is_binary, run_logged
+from ._util import BinaryObj, BinaryType, binary_type_from_head
+
+if TYPE_CHECKING:
+    from rich.progress import Progress
 
 logger = logging.getLogger(__name__)
 
+# temporary directories of all jars, removed at once on exit
+_TMPDIRS: list[Path] = []
+
+
+@atexit.register
+def _cleanup():
+    for t in _TMPDIRS:
+        print(f"Cleaning up {t}")
+        shutil.rmtree(t, ignore_errors=True)
+
 
 @dataclass
 class Jar(BinaryObj):
@@ -24,37 +35,39 @@ class Jar(BinaryObj):
     binaries: list[MachOBinary]
 
     @staticmethod
-    def from_path(p: Path, progress: Optional[Progress]) -> "Jar":
+    def from_path(p: Path, progress: Optional["Progress"]) -> "Jar":
+        """Find mach-o binaries in jar p
+
+        Only entries starting with a mach-o magic are extracted to a temporary
+        directory, the full jar is extracted by `create_commands` if needed.
+        """
         if progress:
             task = progress.add_task(f"tempdir({p.name})", total=None)
         t = tempfile.mkdtemp()
-        run_logged(Command(["ditto", "-x", "-k", str(p), t]))
 
-        files = list(Path(t).glob("**/*"))
+        machos = []
+        with zipfile.ZipFile(p) as zf:
+            entries = [entry for entry in zf.infolist() if not entry.is_dir()]
 
-        if progress:
-            progress.update(task, total=len(files))
+            if progress:
+                progress.update(task, total=len(entries))
 
-        machos = []
-        for file in files:
-            binary_type = is_binary(file)
+            for entry in entries:
+                with zf.open(entry) as f:
+                    binary_type = binary_type_from_head(entry.filename, f.read(8))
 
-            if binary_type == BinaryType.MACHO:
-                machos.append(parse_macho(file))
-            elif binary_type == BinaryType.JAR:
-                logger.warning(f"Nested jar in {p}: {file} - not expected")
+                if binary_type == BinaryType.MACHO:
+                    machos.append(parse_macho(Path(zf.extract(entry, t))))
+                elif binary_type == BinaryType.JAR:
+                    logger.warning("Nested jar in %s: %s - not expected", p, entry.filename)
 
-            if progress:
-                progress.advance(task, 1)
+                if progress:
+                    progress.advance(task, 1)
 
         if progress:
             progress.remove_task(task)
 
-        def _cleanup(t):
-            print(f"Cleaning up {t}")
-            shutil.rmtree(t, ignore_errors=True)
-
-        atexit.register(partial(_cleanup, t))
+        _TMPDIRS.append(Path(t))
 
         return Jar(path=p, temp_path=Path(t), binaries=machos)
 
@@ -62,7 +75,8 @@ class Jar(BinaryObj):
     def create_commands(self) -> list[Command]:
         return [
             Command(["mkdir", "-p", str(self.temp_path)], run_python=False),
-            Command(["ditto", "-x", "-k", str(self.path), str(self.temp_path)], run_python=False),
+            # from_path only extracted the mach-o binaries, repack needs everything
+            Command(["ditto", "-x", "-k", str(self.path), str(self.temp_path)]),
         ]
 
     def sign(self, entitlement_file, developer_id) -> list[Command]:
@@ -73,7 +87,7 @@ class Jar(BinaryObj):
         sign_commands = []
 
         for binary in self.binaries:
-            sign_commands.append(sign_impl(entitlement_file, developer_id, binary.path))
+            sign_commands.append(sign_impl(entitlement_file, developer_id, binary.path, parallel=True))
 
         return sign_commands
 
@@ -1,7 +1,8 @@
 import re
-import subprocess
+import sys
 from dataclasses import dataclass
 from enum import IntEnum
+from functools import cached_property, lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -10,9 +11,11 @@ from packaging import version
 from ._commands import Command
 from ._util import BinaryObj, run_logged
 
-_LOAD_DYLIB_REGEX = re.compile(r"\s*name (?P<dylib>.+) \(offset \d+\)$")
-_LOAD_RCPATH_REGEX = re.compile(r"\s*path (?P<rc_path>.+) \(offset \d+\)$")
+# applied to the whole body of a load command, hence MULTILINE
+_LOAD_DYLIB_REGEX = re.compile(r"^\s*name (?P<dylib>.+) \(offset \d+\)[ \t]*$", re.MULTILINE)
+_LOAD_RCPATH_REGEX = re.compile(r"^\s*path (?P<rc_path>.+) \(offset \d+\)[ \t]*$", re.MULTILINE)
 _LOAD_COMMAND_REGEX = re.compile(r"(Load command \d+.*?)(?=Load command \d+|$)", re.DOTALL)
+_LOAD_COMMAND_HEAD_REGEX = re.compile(r"\s*Load command (?P<index>\d+)\s+cmd (?P<cmd>\S+)\s+cmdsize (?P<cmd_size>\d+)")
 
 
 _VTOOL_OUT_PARSE_PLATFORM = re.compile(r"platform (?P<platform>.*)\n", re.IGNORECASE)
@@ -25,26 +28,23 @@ class DependencyNotFountInBundle(Exception):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class LoadCommand:
     index: str
     cmd: str
     cmd_size: str
-    cmd_specifics: list[str]
+    cmd_specifics: str
+    """Remaining lines of the load command, unparsed"""
 
     @staticmethod
-    def from_otool_output(otool_l_output) -> "LoadCommand":
-        lines: list[str] = [x.strip() for x in otool_l_output.split("\n")]
-
-        # strip trailing empty lines
-        lines = [line for line in lines if line]
-
-        index = re.search(r"Load command (\d+)", lines[0]).groups()[0]
-        cmd = re.search(r"cmd (\S+)", lines[1]).groups()[0]
-        cmd_size = re.search(r"cmdsize (\d+)", lines[2]).groups()[0]
+    def from_otool_output(otool_l_output: str) -> "LoadCommand":
+        m = _LOAD_COMMAND_HEAD_REGEX.match(otool_l_output)
+        if m is None:
+            raise ValueError(f"Could not parse load command {otool_l_output}")
 
-        additional = lines[3:]
-        return LoadCommand(index=index, cmd=cmd, cmd_size=cmd_size, cmd_specifics=additional)
+        return LoadCommand(
+            index=m["index"], cmd=m["cmd"], cmd_size=m["cmd_size"], cmd_specifics=otool_l_output[m.end() :]
+        )
 
 
 class FILETYPE(IntEnum):
@@ -74,7 +74,7 @@ class FILETYPE(IntEnum):
         return f"{self.name}"
 
 
-@dataclass
+@dataclass(slots=True)
 class MachOHeader:
 
     magic: str
@@ -88,7 +88,7 @@ class MachOHeader:
         return MachOHeader(vals[0], FILETYPE.from_hex_str(vals[4]))
 
 
-@dataclass
+@dataclass(frozen=True)
 class Build:
     platform: str
     minos: str
@@ -111,7 +111,7 @@ class Build:
         else:
             sdk = ""
 
-        return Build(platform=platform, minos=minos, sdk=sdk)
+        return _interned_build(platform=platform, minos=minos, sdk=sdk)
 
     @staticmethod
     def _version_req_met(v: str) -> bool:
@@ -121,7 +121,7 @@ class Build:
 
         return False
 
-    @property
+    @cached_property
     def is_valid(self) -> bool:
         """Will pass gatekeeper"""
         if self.platform and _VALID_VER.match(self.minos) and _VALID_VER.match(self.sdk):
@@ -131,7 +131,7 @@ class Build:
 
         return False
 
-    @property
+    @cached_property
     def can_fix(self) -> bool:
         """Libraries that were build with too old of an sdk can not be fixed."""
         if _VALID_VER.match(self.minos):
@@ -204,6 +204,12 @@ class Build:
         return Build(platform=platform, minos=minos, sdk=sdk)
 
 
+@lru_cache(maxsize=None)
+def _interned_build(platform: str, minos: str, sdk: str) -> Build:
+    """Binaries built with the same toolchain share one instance (and its cached validity)"""
+    return Build(platform=platform, minos=minos, sdk=sdk)
+
+
 def vtool_read(path: Path) -> Build:
     """
     vtool -show-build  ilastik-1.4.1rc2-OSX.app/Contents/ilastik-release/lib/libxcb.1.dylib
@@ -241,35 +247,47 @@ def vtool_overwrite(path: Path, build: Build) -> Command:
 @dataclass
 class MachOBinary(BinaryObj):
     header: MachOHeader
-    rpaths: list[Path]
-    dylibs: list[Path]
+    load_commands: tuple[LoadCommand, ...]
     build: Optional[Build]
-    id_: Optional[Path]
 
+    # load commands are only interpreted once accessed
+    @cached_property
+    def rpaths(self) -> tuple[str, ...]:
+        return rpaths(self.load_commands)
 
-def otool_l(path: Path) -> tuple[LoadCommand, ...]:
-    out = run_logged(Command(args=["otool", "-l", str(path)]))
-    cmds = tuple(LoadCommand.from_otool_output(x) for x in _LOAD_COMMAND_REGEX.findall(out))
-    return cmds
+    @cached_property
+    def dylibs(self) -> tuple[str, ...]:
+        return dylibs(self.load_commands)
 
+    @cached_property
+    def id_(self) -> Optional[Path]:
+        return libid(self.load_commands)
+
+
+def otool_hl(path: Path) -> tuple[MachOHeader, tuple[LoadCommand, ...]]:
+    """Read header and load commands with a single otool invocation"""
+    out = run_logged(Command(args=["otool", "-hl", str(path)]))
+    header_out, sep, load_commands_out = out.partition("Load command 0")
+    header = MachOHeader.from_otool_output(header_out)
+    cmds = tuple(
+        LoadCommand.from_otool_output(m.group(1)) for m in _LOAD_COMMAND_REGEX.finditer(sep + load_commands_out)
+    )
+    return header, cmds
 
-def otool_h(path: Path) -> MachOHeader:
-    try:
-        out = run_logged(Command(["otool", "-h", str(path)]))
-    except subprocess.CalledProcessError:
-        return False
-    return MachOHeader.from_otool_output(out)
 
+def rpaths(cmds: tuple[LoadCommand, ...]) -> tuple[str, ...]:
+    """LC_RPATH
 
-def rpaths(cmds: tuple[LoadCommand, ...]) -> list[Path]:
+    returns the raw (interned) rpath strings, convert to Path where needed
+    """
     rcpath_cmds = [cmd for cmd in cmds if cmd.cmd == "LC_RPATH"]
     paths = []
     for rcpath_cmd in rcpath_cmds:
-        p = [x for x in rcpath_cmd.cmd_specifics if x.split()[0] == "path"]
+        p = _LOAD_RCPATH_REGEX.findall(rcpath_cmd.cmd_specifics)
         assert len(p) == 1
-        paths.append(Path(_LOAD_RCPATH_REGEX.match(p[0]).groupdict()["rc_path"]))
+        paths.append(sys.intern(p[0]))
 
-    return paths
+    return tuple(paths)
 
 
 def libid(cmds: tuple[LoadCommand, ...]) -> Optional[Path]:
@@ -277,43 +295,34 @@ def libid(cmds: tuple[LoadCommand, ...]) -> Optional[Path]:
     if len(id_commands) == 0:
         return None
     id_command = id_commands[0]
-    p = [x for x in id_command.cmd_specifics if x.split()[0] == "name"]
-    assert len(p) == 1
-    if m := _LOAD_DYLIB_REGEX.match(p[0]):
-        p = m.groupdict()["dylib"]
-        dylib = Path(p)
-    else:
+    p = _LOAD_DYLIB_REGEX.findall(id_command.cmd_specifics)
+    if len(p) != 1:
         raise ValueError(f"Could not parse command {id_command}")
 
-    return dylib
+    return Path(p[0])
 
 
-def dylibs(cmds: tuple[LoadCommand, ...]) -> list[Path]:
+def dylibs(cmds: tuple[LoadCommand, ...]) -> tuple[str, ...]:
     """LC_LOAD_DYLIB
 
-    returns a list of dynamic libraries loaded via load commands
+    returns the raw (interned) paths of dynamic libraries loaded via load commands
     """
     dylib_cmds = [cmd for cmd in cmds if cmd.cmd in ("LC_LOAD_DYLIB", "LC_REEXPORT_DYLIB")]
     dylibs = []
-    for rcpath_cmd in dylib_cmds:
-        p = [x for x in rcpath_cmd.cmd_specifics if x.split()[0] == "name"]
-        assert len(p) == 1
-        if m := _LOAD_DYLIB_REGEX.match(p[0]):
-            p = m.groupdict()["dylib"]
-            dylibs.append(Path(p))
+    for dylib_cmd in dylib_cmds:
+        p = _LOAD_DYLIB_REGEX.findall(dylib_cmd.cmd_specifics)
+        assert len(p) <= 1
+        if p:
+            dylibs.append(sys.intern(p[0]))
 
-    return dylibs
+    return tuple(dylibs)
 
 
 def parse_macho(some_path: Path):
     if not some_path.is_absolute():
         some_path = some_path.resolve()
     try:
-        header = otool_h(some_path)
-        cmds = otool_l(some_path)
-        paths = rpaths(cmds)
-        lib_id = libid(cmds)
-        libs = dylibs(cmds)
+        header, cmds = otool_hl(some_path)
     except Exception as e:
         raise ValueError(f"Problem parsing {some_path}") from e
 
@@ -324,7 +333,7 @@ def parse_macho(some_path: Path):
     #     build = None
     # else:
     build = vtool_read(some_path)
-    return MachOBinary(some_path, header, paths, libs, build, lib_id)
+    return MachOBinary(some_path, header, cmds, build)
 
 
 def fix_lib_id(library_path: Path, new_path: Path) -> Command:
@@ -347,7 +356,7 @@ def fix_rpath(library_path, old_rpath, new_rpath) -> Command:
     return Command(args=args)
 
 
-def sign_impl(entitlement_file: Path, developer_id: str, path: Path) -> Command:
+def sign_impl(entitlement_file: Path, developer_id: str, path: Path, parallel: bool = False) -> Command:
     args = [
         "/usr/bin/codesign",
         "--entitlements",
@@ -361,4 +370,4 @@ def sign_impl(entitlement_file: Path, developer_id: str, path: Path) -> Command:
         str(path),
     ]
 
-    return Command(args=args, retry_backoff=True)
+    return Command(args=args, retry_backoff=True, parallel=parallel)
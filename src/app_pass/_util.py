@@ -1,16 +1,23 @@
 import enum
 import logging
+import os
 import pathlib
+import shlex
+import stat
 import struct
 import subprocess
 import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import Iterator, Optional, Tuple
-
-from rich.progress import Progress
+from itertools import groupby
+from typing import TYPE_CHECKING, Iterator, Optional, Tuple
 
 from ._commands import Command
 
+if TYPE_CHECKING:
+    from rich.progress import Progress
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,124 +32,295 @@ class BinaryObj:
     path: pathlib.Path
 
 
-# kind of assuming little endian...
-MACHOMAGIC = (
-    0xFEEDFACF,
-    0xFEEDFACE,
-    0xBEBAFECA,
-    # okay whatever, doesn't hurt to check the other ordering, too
-    # false positives will be weeded out by `file` anyway
-    0xCFFAEDFE,
-    0xCEFAEDFE,
-    0xCAFEBABE,
+# thin mach-o binaries, either byte order
+_MACHO_MAGICS = frozenset((b"\xfe\xed\xfa\xce", b"\xfe\xed\xfa\xcf", b"\xce\xfa\xed\xfe", b"\xcf\xfa\xed\xfe"))
+# universal (fat) binaries, shares the magic with java class files
+_FAT_MAGIC = b"\xca\xfe\xba\xbe"
+# java class files have their version (>= 45) where fat binaries have the number of architectures
+_MAX_FAT_ARCHS = 30
+_ZIP_MAGIC = b"PK\x03\x04"
+_JAR_SUFFIXES = frozenset((".jar", ".sym"))
+
+# never classified as binaries
+_SKIP_SUFFIXES = frozenset(
+    {
+        # static archives and object files are ignored
+        ".a",
+        ".o",
+        # sources
+        ".py",
+        ".pyc",
+        ".class",
+        ".c",
+        ".h",
+        ".cpp",
+        ".hpp",
+        ".cxx",
+        ".hxx",
+        # resources
+        ".txt",
+        ".md",
+        ".html",
+        ".css",
+        ".js",
+        ".json",
+        ".plist",
+        ".png",
+        ".jpg",
+        ".jpeg",
+        ".gif",
+        ".icns",
+    }
 )
 
+# number of commands run per shell process in `run_batched`
+_BATCH_SIZE = 256
+
+# number of scanned files per progress update in `iter_all_binaries`
+_PROGRESS_STEP = 64
 
-def run_logged(command: Command) -> str:
-    logger.debug(f"Executing command {' '.join(command.args)}")
 
-    out = subprocess.run(command.args, stdout=subprocess.PIPE, stdin=subprocess.PIPE, cwd=command.cwd)
+def _run(command: Command) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        command.args,
+        stdin=subprocess.PIPE,
+        capture_output=True,
+        cwd=command.cwd,
+        encoding="utf-8",
+        errors="replace",
+    )
+
+
+def run_logged(command: Command) -> str:
+    out = _run(command)
     if out.returncode != 0:
-        logger.warning(f"Nonzero exit code ({out.returncode}) from command {' '.join(command.args)}")
+        logger.warning(
+            "Nonzero exit code (%s) from command %s: %s", out.returncode, " ".join(command.args), out.stderr.strip()
+        )
         raise subprocess.CalledProcessError(
-            returncode=out.returncode,
-            cmd=command.args,
-            stderr=out.stderr.decode("utf-8") if out.stderr else "",
-            output=out.stdout.decode("utf-8") if out.stdout else "",
+            returncode=out.returncode, cmd=command.args, stderr=out.stderr, output=out.stdout
         )
 
-    logger.debug(f"Successful command {' '.join(command.args)}")
+    # a single event per command, joining the arguments only if it is emitted
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Successful command %s", " ".join(command.args))
 
-    return out.stdout.decode("utf-8")
+    return out.stdout
 
 
-def run_commands(commands: list[Command]):
+def run_with_backoff(command: Command):
     last_backoff = object()
 
-    for command in commands:
-        if not command.run_python:
+    if command.retry_backoff:
+        backoff = [10, 30, last_backoff]
+    else:
+        backoff = [last_backoff]
+
+    for sleep_time in backoff:
+        try:
+            run_logged(command)
+        except subprocess.CalledProcessError:
+            if sleep_time == last_backoff:
+                raise
+            logger.info("Retrying... after %ss", sleep_time)
+            time.sleep(sleep_time)
+        else:
+            break
+
+
+def run_parallel(commands: list[Command], max_parallel: Optional[int] = None):
+    """Run commands concurrently, at most `max_parallel` (default: cpu count) at a time
+
+    Threads only wait on the child processes, so they don't contend for the GIL.
+    """
+    if not commands:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_parallel or os.cpu_count()) as executor:
+        futures = [executor.submit(run_with_backoff, command) for command in commands]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def run_batched(commands: list[Command]):
+    """Run commands in as few shell processes as possible
+
+    Commands are executed by `/bin/sh -e` in chunks of `_BATCH_SIZE`, so the first
+    failing command aborts the run. The shell traces commands (`-x`) to stderr, so
+    the failing one can be reported.
+    """
+    for start in range(0, len(commands), _BATCH_SIZE):
+        chunk = commands[start : start + _BATCH_SIZE]
+        if len(chunk) == 1:
+            run_logged(chunk[0])
             continue
 
-        if command.retry_backoff:
-            backoff = [10, 30, last_backoff]
+        lines = []
+        for command in chunk:
+            line = shlex.join(command.args)
+            if command.cwd:
+                line = f"(cd {shlex.quote(str(command.cwd))} && {line})"
+            lines.append(line)
+
+        script = Command(["/bin/sh", "-e", "-x", "-c", "\n".join(lines)])
+        out = _run(script)
+        if out.returncode != 0:
+            # the trace of the failing command is followed by its own output
+            stderr_lines = out.stderr.splitlines()
+            traced = [i for i, line in enumerate(stderr_lines) if line.startswith("+")]
+            failed = stderr_lines[traced[-1]].lstrip("+ ") if traced else "unknown"
+            stderr = "\n".join(stderr_lines[traced[-1] + 1 :] if traced else stderr_lines).strip()
+            logger.warning("Nonzero exit code (%s) from command %s: %s", out.returncode, failed, stderr)
+            raise subprocess.CalledProcessError(
+                returncode=out.returncode, cmd=script.args, stderr=stderr, output=out.stdout
+            )
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Successful batch of %s commands", len(chunk))
+
+
+def run_commands(commands: list[Command], batch: bool = False, max_parallel: Optional[int] = None):
+    """Run commands in order
+
+    Consecutive commands marked as `parallel` are run concurrently, all other
+    commands act as a barrier.
+    With `batch`, consecutive commands that don't need retrying are run through
+    a single shell process instead of one process each.
+    `max_parallel` limits the number of concurrently running commands (default: cpu count).
+    """
+
+    def mode(command: Command) -> str:
+        if command.parallel:
+            return "parallel"
+        if batch and not command.retry_backoff:
+            return "batch"
+        return "single"
+
+    for kind, group in groupby((command for command in commands if command.run_python), key=mode):
+        group_commands = list(group)
+        if kind == "parallel":
+            run_parallel(group_commands, max_parallel=max_parallel)
+        elif kind == "batch":
+            run_batched(group_commands)
         else:
-            backoff = [last_backoff]
-
-        for sleep_time in backoff:
-            try:
-                run_logged(command)
-            except subprocess.CalledProcessError:
-                if sleep_time == last_backoff:
-                    raise
-                logger.info(f"Retrying... after {sleep_time}s")
-                time.sleep(sleep_time)
-            else:
-                break
+            for command in group_commands:
+                run_with_backoff(command)
 
 
 def serialize_to_sh(commands: list[Command], sh_cmd_out: pathlib.Path):
-    cmds = []
-    for cmd in commands:
-        cmds.extend(cmd.to_sh())
     if sh_cmd_out.exists():
-        logger.warning(f"Found {sh_cmd_out} - overwriting.")
+        logger.warning("Found %s - overwriting.", sh_cmd_out)
 
-    sh_cmd_out.write_text("\n".join(cmds))
+    # streamed line by line, without a trailing newline
+    with open(sh_cmd_out, "w", buffering=1 << 16) as f:
+        separator = ""
+        for cmd in commands:
+            for line in cmd.to_sh_iter():
+                f.write(separator)
+                f.write(line)
+                separator = "\n"
 
 
-def is_binary(path: pathlib.Path) -> BinaryType:
-    if path.is_dir():
-        return BinaryType.NONE
+def _suffix(name: str) -> str:
+    return os.path.splitext(name)[1].lower()
 
-    if path.suffix in (".a", ".o"):
-        logger.debug(f"Ignoring .a, and .o files: {path}")
-        return BinaryType.NONE
 
-    if path.suffix in (".py", ".pyc", ".txt", ".md", ".class", ".cpp", ".hpp", ".cxx", ".hxx", ".c", ".h", ".class"):
+def binary_type_from_head(name: str, head: bytes) -> BinaryType:
+    """Classify a file by its name and its first 8 bytes"""
+    suffix = _suffix(name)
+    # e.g. object files (.o) start with a mach-o magic, too
+    if suffix in _SKIP_SUFFIXES:
         return BinaryType.NONE
 
-    if path.suffix in (".jar", ".sym"):
-        file_out = run_logged(Command(["file", str(path)])).lower()
-        if "java archive data (jar)" in file_out or "zip archive data" in file_out:
-            return BinaryType.JAR
+    if head[:4] in _MACHO_MAGICS:
+        return BinaryType.MACHO
 
-    with open(path, "rb") as f:
-        magic_bytes = f.read(4)
+    if head[:4] == _FAT_MAGIC and len(head) == 8:
+        (nfat_arch,) = struct.unpack(">I", head[4:])
+        if 0 < nfat_arch < _MAX_FAT_ARCHS:
+            if nfat_arch > 1:
+                logger.warning("Multiple architectures in file %s", name)
+            return BinaryType.MACHO
 
-    if len(magic_bytes) != 4:
+    if suffix in _JAR_SUFFIXES and head[:4] == _ZIP_MAGIC:
+        return BinaryType.JAR
+
+    return BinaryType.NONE
+
+
+def is_binary(path: pathlib.Path) -> BinaryType:
+    # decided by name alone, before touching the file system
+    if path.suffix.lower() in _SKIP_SUFFIXES:
         return BinaryType.NONE
 
-    xx = struct.unpack("<I", magic_bytes)
+    try:
+        # symlinks (their target is visited on its own), directories and
+        # special files, e.g. fifos that would block on open
+        if not stat.S_ISREG(os.lstat(path).st_mode):
+            return BinaryType.NONE
+        with open(path, "rb") as f:
+            binary_type = binary_type_from_head(str(path), f.read(8))
+            # e.g. self-executing jars with a launcher script in front of the zip,
+            # repacking them would drop the script
+            if binary_type == BinaryType.NONE and _suffix(path.name) in _JAR_SUFFIXES and zipfile.is_zipfile(f):
+                logger.warning("Skipping %s: zip archive with prepended data is not supported", path)
+    except OSError as e:
+        logger.debug("Could not read %s: %s", path, e)
+        return BinaryType.NONE
 
-    if xx[0] in MACHOMAGIC:
-        file_out = run_logged(Command(["file", str(path)])).lower()
-        if "mach-o" in file_out:
-            if "architectures" in file_out:
-                logger.warning(f"Multiple architectures in file {path}")
-            return BinaryType.MACHO
+    return binary_type
 
-    return BinaryType.NONE
+
+def _walk(root: str) -> Iterator[str]:
+    """Paths of all regular files below root, symlinks are not followed
+
+    Directories that can't be read are logged and skipped.
+    """
+    try:
+        with os.scandir(root) as entries:
+            dirs = []
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    yield entry.path
+                elif entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+    except OSError as e:
+        logger.warning("Could not scan %s: %s", root, e)
+        return
+
+    for d in dirs:
+        yield from _walk(d)
 
 
 def iter_all_binaries(
     root: pathlib.Path,
-    progress: Optional[Progress],
+    progress: Optional["Progress"],
 ) -> Iterator[Tuple[pathlib.Path, BinaryType]]:
-    files = list(root.glob("**/*"))
-
     task = None
     if progress is not None:
-        task = progress.add_task("Scanning files", total=len(files))
-    for f in files:
-        if f.is_symlink():
-            continue
-        binary_type = is_binary(f)
+        # files are streamed instead of listed upfront (which would mean walking
+        # the tree twice), so the progress only counts files without a total
+        task = progress.add_task("Scanning files", total=None)
+    pending = 0
+    for f in _walk(str(root)):
+        path = pathlib.Path(f)
+        binary_type = is_binary(path)
         if binary_type != BinaryType.NONE:
-            yield f, binary_type
+            yield path, binary_type
         if progress is not None:
             assert task is not None
-            progress.advance(task, 1)
+            pending += 1
+            # updating the progress for every single file is noticeably slow
+            if pending == _PROGRESS_STEP:
+                progress.advance(task, pending)
+                pending = 0
 
     if progress is not None:
         assert task is not None
+        progress.advance(task, pending)
         progress.remove_task(task)
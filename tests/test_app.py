@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pytest
+
+from app_pass._app import _ALLOWED_SPECIAL, _ALLOWED_SYSTEM, is_allowed_path
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        # exact prefixes
+        ("/usr", True),
+        ("/System", True),
+        ("/Library", True),
+        ("@rpath", True),
+        ("@executable_path", True),
+        ("@loader_path", True),
+        # subpaths
+        ("/usr/lib/libSystem.B.dylib", True),
+        ("/System/Library/Frameworks/Foundation.framework/Foundation", True),
+        ("@rpath/libfoo.dylib", True),
+        ("@loader_path/../lib", True),
+        # look-alike prefixes
+        ("/usrx", False),
+        ("/usrx/lib/libfoo.dylib", False),
+        ("/Libraryx/libfoo.dylib", False),
+        ("@rpathx", False),
+        ("@rpathx/libfoo.dylib", False),
+        ("/Users/someone/usr/lib", False),
+        # relative paths
+        ("usr/lib/libfoo.dylib", False),
+        ("libfoo.dylib", False),
+        ("rpath/libfoo.dylib", False),
+        # raw strings, as read from the load commands
+        ("/usr/", True),
+        ("/usr//lib/libfoo.dylib", True),
+        ("@loader_path/", True),
+        ("@rpath//libfoo.dylib", True),
+        ("//usr/lib/libfoo.dylib", False),
+        ("/opt/homebrew/lib/libfoo.dylib", False),
+    ],
+)
+def test_is_allowed_path(path: str, expected: bool):
+    assert is_allowed_path(path) == expected
+    assert is_allowed_path(Path(path)) == expected
+    # same as the `is_relative_to` check it replaces
+    assert any(Path(path).is_relative_to(x) for x in _ALLOWED_SYSTEM + _ALLOWED_SPECIAL) == expected
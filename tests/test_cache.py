@@ -0,0 +1,49 @@
+import os
+import sqlite3
+from pathlib import Path
+from unittest.mock import Mock
+
+from app_pass._cache import FileCache
+
+
+def test_file_cache_computes_once(tmp_path: Path):
+    some_file = tmp_path / "libfoo.dylib"
+    some_file.write_bytes(b"1234")
+    compute = Mock(return_value="parsed")
+
+    with FileCache(tmp_path / "cache" / "test") as cache:
+        assert cache.get_or_compute(some_file, compute) == "parsed"
+        assert cache.get_or_compute(some_file, compute) == "parsed"
+
+    with FileCache(tmp_path / "cache" / "test") as cache:
+        assert cache.get_or_compute(some_file, compute) == "parsed"
+
+    compute.assert_called_once_with(some_file)
+
+
+def test_file_cache_invalidated_on_modification(tmp_path: Path):
+    some_file = tmp_path / "libfoo.dylib"
+    some_file.write_bytes(b"1234")
+    compute = Mock(side_effect=["first", "second"])
+
+    with FileCache(tmp_path / "cache" / "test") as cache:
+        assert cache.get_or_compute(some_file, compute) == "first"
+        some_file.write_bytes(b"123456")
+        st = some_file.stat()
+        os.utime(some_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert cache.get_or_compute(some_file, compute) == "second"
+
+    assert compute.call_count == 2
+    with sqlite3.connect(tmp_path / "cache" / "test") as db:
+        assert db.execute("SELECT COUNT(*) FROM entries").fetchone() == (1,)
+
+
+def test_file_cache_write_failure_is_not_fatal(tmp_path: Path):
+    some_file = tmp_path / "libfoo.dylib"
+    some_file.write_bytes(b"1234")
+
+    with FileCache(tmp_path / "cache" / "test") as cache:
+        # lambdas can't be pickled
+        result = cache.get_or_compute(some_file, lambda p: lambda: p)
+
+    assert result() == some_file
@@ -1,6 +1,9 @@
+import subprocess
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import pytest
+
 from app_pass._commands import Command
 from app_pass._util import run_commands, serialize_to_sh
 
@@ -119,3 +122,69 @@ def test_run_commands():
 
     for call, expected_path in zip(args, [Path(f"/my/home{i}") for i in range(42)]):
         assert call.kwargs["cwd"] == expected_path
+
+
+def test_run_commands_parallel_respects_barriers():
+    cmds = [Command(["echo", f"{i}"], parallel=True) for i in range(8)]
+    cmds.append(Command(["echo", "barrier"]))
+    cmds.extend(Command(["echo", f"{i}"], parallel=True) for i in range(8, 16))
+
+    with patch("subprocess.run", new=Mock(return_value=Mock(returncode=0))) as popen_mock:
+        run_commands(cmds)
+
+    assert popen_mock.call_count == 17
+    called = [call.args[0][1] for call in popen_mock.call_args_list]
+    assert called.index("barrier") == 8
+    assert set(called[:8]) == {f"{i}" for i in range(8)}
+    assert set(called[9:]) == {f"{i}" for i in range(8, 16)}
+
+
+def test_run_commands_max_parallel():
+    cmds = [Command(["echo", f"{i}"], parallel=True) for i in range(8)]
+
+    with patch("subprocess.run", new=Mock(return_value=Mock(returncode=0))) as popen_mock:
+        run_commands(cmds, max_parallel=1)
+
+    # a single worker runs the commands in submission order
+    assert [call.args[0][1] for call in popen_mock.call_args_list] == [f"{i}" for i in range(8)]
+
+
+def test_run_commands_batched():
+    cmds = [Command(["echo", f"{i}"], cwd=Path(f"/my/home{i}")) for i in range(42)]
+    cmds.append(Command(["codesign", "x"], retry_backoff=True))
+    cmds.append(Command(["echo", "it's done"]))
+
+    with patch("subprocess.run", new=Mock(return_value=Mock(returncode=0))) as popen_mock:
+        run_commands(cmds, batch=True)
+
+    assert popen_mock.call_count == 3
+    batched, retried, single = [call.args[0] for call in popen_mock.call_args_list]
+    assert batched[:4] == ["/bin/sh", "-e", "-x", "-c"]
+    expected = [f"(cd /my/home{i} && echo {i})" for i in range(42)]
+    assert batched[4].split("\n") == expected
+    assert retried == ["codesign", "x"]
+    assert single == ["echo", "it's done"]
+
+
+def test_run_commands_batched_executes(tmp_path: Path):
+    out = tmp_path / "out file.txt"
+    cmds = [Command(["sh", "-c", f'echo {i} >> "{out}"'], cwd=tmp_path) for i in range(3)]
+
+    run_commands(cmds, batch=True)
+
+    assert out.read_text().split() == ["0", "1", "2"]
+
+
+def test_run_commands_batched_reports_failing_command(tmp_path: Path, caplog: pytest.LogCaptureFixture):
+    cmds = [Command(["true"]), Command(["ls", str(tmp_path / "missing")]), Command(["true"])]
+
+    with pytest.raises(subprocess.CalledProcessError):
+        run_commands(cmds, batch=True)
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert message.startswith("Nonzero exit code (")
+    assert f"from command ls {tmp_path / 'missing'}: " in message
+    assert "missing" in message.split(": ", 1)[1]
+    # the trace of the other commands in the batch is not reported
+    assert "+ true" not in message
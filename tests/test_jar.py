@@ -0,0 +1,25 @@
+import struct
+import zipfile
+from pathlib import Path
+from unittest.mock import patch
+
+from app_pass._jar import Jar
+
+
+def test_jar_from_path_extracts_only_macho_candidates(tmp_path: Path):
+    jar_path = tmp_path / "foo.jar"
+    with zipfile.ZipFile(jar_path, "w") as zf:
+        zf.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\n")
+        zf.writestr("native/libjni.dylib", struct.pack("<I", 0xFEEDFACF) + b"\0" * 28)
+        # object files are mach-o, too, but ignored
+        zf.writestr("native/foo.o", struct.pack("<I", 0xFEEDFACF) + b"\0" * 28)
+        # java class files share the magic with fat mach-o binaries
+        zf.writestr("Foo.class", struct.pack(">IHH", 0xCAFEBABE, 0, 52) + b"\0" * 24)
+
+    with patch("app_pass._jar.parse_macho", side_effect=lambda p: p) as parse_macho_mock:
+        jar = Jar.from_path(jar_path, progress=None)
+
+    extracted = sorted(p.relative_to(jar.temp_path).as_posix() for p in jar.temp_path.glob("**/*") if p.is_file())
+    assert extracted == ["native/libjni.dylib"]
+    parse_macho_mock.assert_called_once_with(jar.temp_path / "native" / "libjni.dylib")
+    assert jar.binaries == [jar.temp_path / "native" / "libjni.dylib"]
@@ -0,0 +1,92 @@
+from pathlib import Path
+from unittest.mock import patch
+
+from app_pass._macho import FILETYPE, Build, dylibs, libid, otool_hl, rpaths
+
+OTOOL_HL_OUTPUT = """/path/to/libfoo.dylib:
+Mach header
+      magic  cputype cpusubtype  caps    filetype ncmds sizeofcmds      flags
+ 0xfeedfacf 16777228          0  0x00           6     6        584 0x00100085
+Load command 0
+      cmd LC_SEGMENT_64
+  cmdsize 232
+  segname __TEXT
+   vmaddr 0x0000000000000000
+   vmsize 0x0000000000004000
+Load command 1
+          cmd LC_ID_DYLIB
+      cmdsize 56
+         name @rpath/libfoo.dylib (offset 24)
+   time stamp 1 Thu Jan  1 01:00:01 1970
+      current version 1.0.0
+compatibility version 1.0.0
+Load command 2
+          cmd LC_LOAD_DYLIB
+      cmdsize 56
+         name @rpath/libbar.dylib (offset 24)
+   time stamp 2 Thu Jan  1 01:00:02 1970
+      current version 1.0.0
+compatibility version 1.0.0
+Load command 3
+          cmd LC_LOAD_DYLIB
+      cmdsize 56
+         name /usr/lib/libSystem.B.dylib (offset 24)
+   time stamp 2 Thu Jan  1 01:00:02 1970
+      current version 1319.0.0
+compatibility version 1.0.0
+Load command 4
+          cmd LC_RPATH
+      cmdsize 32
+         path @loader_path/ (offset 12)
+Load command 5
+          cmd LC_RPATH
+      cmdsize 48
+         path /Users/someone/build/lib (offset 12)
+"""
+
+
+@patch("app_pass._macho.run_logged", return_value=OTOOL_HL_OUTPUT)
+def test_otool_hl(run_logged_mock):
+    header, cmds = otool_hl(Path("/path/to/libfoo.dylib"))
+
+    run_logged_mock.assert_called_once()
+    assert run_logged_mock.call_args.args[0].args == ["otool", "-hl", "/path/to/libfoo.dylib"]
+    assert header.magic == "0xfeedfacf"
+    assert header.filetype == FILETYPE.dynamically_bound_shared_library
+    assert [cmd.cmd for cmd in cmds] == [
+        "LC_SEGMENT_64",
+        "LC_ID_DYLIB",
+        "LC_LOAD_DYLIB",
+        "LC_LOAD_DYLIB",
+        "LC_RPATH",
+        "LC_RPATH",
+    ]
+    assert [cmd.index for cmd in cmds] == [f"{i}" for i in range(6)]
+
+
+@patch("app_pass._macho.run_logged", return_value=OTOOL_HL_OUTPUT)
+def test_load_command_paths(run_logged_mock):
+    _, cmds = otool_hl(Path("/path/to/libfoo.dylib"))
+
+    assert libid(cmds) == Path("@rpath/libfoo.dylib")
+    assert dylibs(cmds) == ("@rpath/libbar.dylib", "/usr/lib/libSystem.B.dylib")
+    assert rpaths(cmds) == ("@loader_path/", "/Users/someone/build/lib")
+
+
+def test_build_from_vtool_output_shared():
+    vtool_output = """{path}:
+Load command 16
+      cmd LC_BUILD_VERSION
+  cmdsize 24
+ platform MACOS
+    minos 10.9
+      sdk 10.13
+   ntools 0
+"""
+    build_a = Build.from_vtool_output(vtool_output.format(path="/path/to/liba.dylib"))
+    build_b = Build.from_vtool_output(vtool_output.format(path="/path/to/libb.dylib"))
+
+    assert build_a == Build(platform="macos", minos="10.9", sdk="10.13")
+    assert build_a is build_b
+    assert build_a.is_valid
+    assert build_a.can_fix
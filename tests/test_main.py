@@ -1,3 +1,19 @@
+import pytest
+
+from app_pass.__main__ import _build_parser
+
+
 def test_main():
     """Dummy test in order to make conda build pass"""
     assert True
+
+
+def test_jobs_option_on_signing_subcommands():
+    parser = _build_parser()
+    assert parser.parse_args(["sign", "-j", "2", "my.app", "ent.plist", "dev"]).jobs == 2
+    assert parser.parse_args(["fixsign", "my.app", "ent.plist", "dev"]).jobs is None
+    assert not hasattr(parser.parse_args(["fix", "my.app"]), "jobs")
+
+    for jobs in ("0", "-1", "many"):
+        with pytest.raises(SystemExit):
+            parser.parse_args(["sign", "--jobs", jobs, "my.app", "ent.plist", "dev"])
@@ -1,9 +1,11 @@
+import os
 import pathlib
+import zipfile
 from unittest.mock import Mock, PropertyMock, patch
 
 import pytest
 
-from app_pass._util import BinaryType, is_binary
+from app_pass._util import BinaryType, binary_type_from_head, is_binary, iter_all_binaries
 
 
 @pytest.mark.parametrize("suffix", [".py", ".txt", ".md", ".h", ".cpp", ".hpp", ".class"])
@@ -30,3 +32,77 @@ def test_is_binary_ignore_static_archives(subprocess_mock, suffix: str):
         assert result == BinaryType.NONE
         mocked_suffix.assert_called_once()
         subprocess_mock.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "name, head, expected",
+    [
+        ("libfoo.dylib", b"\xcf\xfa\xed\xfe\x0c\x00\x00\x01", BinaryType.MACHO),
+        ("foo", b"\xfe\xed\xfa\xce\x00\x00\x00\x07", BinaryType.MACHO),
+        ("libfat.dylib", b"\xca\xfe\xba\xbe\x00\x00\x00\x02", BinaryType.MACHO),
+        ("Foo", b"\xca\xfe\xba\xbe\x00\x00\x00\x34", BinaryType.NONE),
+        ("foo.jar", b"PK\x03\x04\x14\x00\x08\x00", BinaryType.JAR),
+        ("foo.zip", b"PK\x03\x04\x14\x00\x08\x00", BinaryType.NONE),
+        ("foo.jar", b"\xcf\xfa\xed\xfe\x0c\x00\x00\x01", BinaryType.MACHO),
+        ("FOO.JAR", b"PK\x03\x04\x14\x00\x08\x00", BinaryType.JAR),
+        ("native/foo.o", b"\xcf\xfa\xed\xfe\x0c\x00\x00\x01", BinaryType.NONE),
+        ("libfoo.A", b"\xcf\xfa\xed\xfe\x0c\x00\x00\x01", BinaryType.NONE),
+        ("short", b"\xcf\xfa", BinaryType.NONE),
+    ],
+)
+def test_binary_type_from_head(name: str, head: bytes, expected: BinaryType):
+    assert binary_type_from_head(name, head) == expected
+
+
+def test_iter_all_binaries_skips_symlinks(tmp_path: pathlib.Path):
+    lib_dir = tmp_path / "Contents" / "lib"
+    lib_dir.mkdir(parents=True)
+    (lib_dir / "libfoo.dylib").write_bytes(b"\xcf\xfa\xed\xfe\x0c\x00\x00\x01")
+    (lib_dir / "README.md").write_text("not a binary")
+    (lib_dir / "libfoo.1.dylib").symlink_to("libfoo.dylib")
+    (tmp_path / "Contents" / "Current").symlink_to("lib")
+
+    assert list(iter_all_binaries(tmp_path, progress=None)) == [(lib_dir / "libfoo.dylib", BinaryType.MACHO)]
+
+
+def test_is_binary_only_regular_files(tmp_path: pathlib.Path):
+    lib = tmp_path / "libfoo.dylib"
+    lib.write_bytes(b"\xcf\xfa\xed\xfe\x0c\x00\x00\x01")
+    (tmp_path / "libfoo.1.dylib").symlink_to(lib)
+    os.mkfifo(tmp_path / "fifo")
+
+    assert is_binary(lib) == BinaryType.MACHO
+    assert is_binary(tmp_path / "libfoo.1.dylib") == BinaryType.NONE
+    assert is_binary(tmp_path / "fifo") == BinaryType.NONE
+    assert is_binary(tmp_path) == BinaryType.NONE
+
+
+def test_is_binary_jar_with_prepended_data(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture):
+    jar_path = tmp_path / "foo.jar"
+    with zipfile.ZipFile(jar_path, "w") as zf:
+        zf.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\n")
+    upper_jar = tmp_path / "A.JAR"
+    upper_jar.write_bytes(jar_path.read_bytes())
+    launcher_jar = tmp_path / "B.JAR"
+    launcher_jar.write_bytes(b"#!/bin/sh\nexec java -jar $0\n" + jar_path.read_bytes())
+    fake_jar = tmp_path / "fake.jar"
+    fake_jar.write_bytes(b"garbage PK\x05\x06 garbage")
+
+    assert is_binary(jar_path) == BinaryType.JAR
+    assert is_binary(upper_jar) == BinaryType.JAR
+    # repacking would drop the launcher script
+    assert is_binary(launcher_jar) == BinaryType.NONE
+    assert "B.JAR: zip archive with prepended data is not supported" in caplog.text
+    assert is_binary(fake_jar) == BinaryType.NONE
+    assert "fake.jar" not in caplog.text
+
+
+def test_iter_all_binaries_skips_unreadable_dirs(tmp_path: pathlib.Path):
+    (tmp_path / "libfoo.dylib").write_bytes(b"\xcf\xfa\xed\xfe\x0c\x00\x00\x01")
+    locked = tmp_path / "locked"
+    locked.mkdir()
+
+    with patch("os.scandir", side_effect=[os.scandir(tmp_path), PermissionError("denied")]):
+        result = list(iter_all_binaries(tmp_path, progress=None))
+
+    assert result == [(tmp_path / "libfoo.dylib", BinaryType.MACHO)]